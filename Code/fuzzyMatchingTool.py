@@ -8,35 +8,109 @@
 # Base libraries
 import sys
 import os
+import re
+import math
 import queue
 import threading
 import random
+from concurrent.futures import ThreadPoolExecutor
+import functools
+import hashlib
+import tempfile
+from types import SimpleNamespace
+from collections import defaultdict, OrderedDict
 from datetime import datetime
 from typing import Callable, Union
 from tkinter import messagebox
 
 # External libraries
-import pandas as pd
-import rapidfuzz as rf
 import customtkinter as ctk
-from unidecode import unidecode
+
+# Data libraries, these are slow to import and not needed to draw the window so are imported by load_libraries
+np = pd = rf = unidecode = load_workbook = None
+
+# Rows of dataset 1 scored per cdist call
+CHUNK_SIZE = 1024
+
+# Rows of dataset 2 scored per cdist call for highest matches and matches above threshold, bounding each block of
+# scores held in memory to CHUNK_SIZE x TILE_SIZE bytes (64MB)
+TILE_SIZE = 65536
+
+# Total size of the score matrices of distinct strings kept between runs, so rerunning on the same strings only
+# with a different output type reuses the scores
+SCORE_CACHE_BYTES = 256 * 1024 ** 2
+
+# Blocking settings: tokens found in more than 0.1% of rows (and at least 100 rows) are treated as stopwords
+BLOCK_MAX_SHARE = 0.001
+BLOCK_MIN_ROWS = 100
+
+# Token separators RapidFuzz uses in strings without characters beyond Latin-1, which exclude no-break space and next line
+LATIN_1_SEPARATORS = re.compile('[\t\n\x0b\x0c\r\x1c-\x20]+')
+
+# Largest output written to xlsx or dta, larger outputs must be exported to a CSV or Parquet file
+MAX_OUTPUT_ROWS = 100000
+
+# %% Define library loader
+
+def load_libraries():
+    '''
+    Imports the data libraries into the module namespace, later calls return immediately.
+    Started on a background thread at launch, and called again before first use to wait for the imports to finish.
+    '''
+    global np, pd, rf, unidecode, load_workbook
+    # Note: load_workbook is assigned last, so once set all the libraries are available
+    if load_workbook is not None:
+        return
+    import numpy as np
+    import pandas as pd
+    import rapidfuzz as rf
+    from unidecode import unidecode
+    from openpyxl import load_workbook
 
 # %% Define helper classes
 
 class TextRedirector:
     '''
     A utility class to redirect text output to a CTkinter Textbox widget.
+    Lines are buffered and inserted together every 50ms, rather than scheduling a redraw for each write.
+    Lines written before a widget is attached are kept until it is.
     '''
-    def __init__(self, widget):
+    def __init__(self, widget=None):
         self.widget = widget
+        self.buffer = []
+        self.pending = False
+        self.lock = threading.Lock()  # Writes also come from the worker thread
 
     def write(self, string):
         if string.strip():  # Only log non-empty lines
-            self.widget.after(0, self.widget.insert, "end", string + "\n") # Insert line between writes
-            self.widget.after(0, self.widget.see, "end") # Scroll to latest line
+            with self.lock:
+                self.buffer.append(string + "\n") # Insert line between writes
+                if not self.pending and self.widget is not None:
+                    self.pending = True
+                    self.widget.after(50, self.flush_buffer)
+
+    def attach(self, widget):
+        '''
+        Sets the widget to write to, and inserts any lines written before it was created.
+        '''
+        with self.lock:
+            self.widget = widget
+            self.pending = True
+        self.widget.after(50, self.flush_buffer)
+
+    def flush_buffer(self):
+        '''
+        Inserts all buffered lines into the widget at once, run on the main thread.
+        '''
+        with self.lock:
+            text = "".join(self.buffer)
+            self.buffer.clear()
+            self.pending = False
+        self.widget.insert("end", text)
+        self.widget.see("end") # Scroll to latest line
             
     def flush(self):
-        pass  # No buffering required
+        pass  # Buffer is emptied on the main thread by flush_buffer
 
 
 class IntSpinbox(ctk.CTkFrame):
@@ -75,26 +149,23 @@ class IntSpinbox(ctk.CTkFrame):
         self.entry.insert(0, "80")
 
     def add_button_callback(self):
-        if self.command is not None:
-            self.command()
-        try:
-            value = int(self.entry.get()) + self.step_size
-            if 0 <= value <= self.max_entry:
-                self.entry.delete(0, "end")
-                self.entry.insert(0, value)
-        except ValueError:
-            return
+        self.step(self.step_size)
 
     def subtract_button_callback(self):
+        self.step(-self.step_size)
+
+    def step(self, delta: int):
+        '''
+        Moves the entry by delta, clamped to between 0 and max_entry. Entries that are not integers are left unchanged.
+        '''
         if self.command is not None:
             self.command()
         try:
-            value = int(self.entry.get()) - self.step_size
-            if 0 <= value <= self.max_entry:
-                self.entry.delete(0, "end")
-                self.entry.insert(0, value)
+            value = min(max(int(self.entry.get()) + delta, 0), self.max_entry)
         except ValueError:
             return
+        self.entry.delete(0, "end")
+        self.entry.insert(0, value)
 
     def get(self) -> Union[int, None]:
         try:
@@ -106,6 +177,106 @@ class IntSpinbox(ctk.CTkFrame):
         self.entry.delete(0, "end")
         self.entry.insert(0, str(value))
 
+# %% Define optional Numba kernels
+
+# The workqueue threading layer aborts if parallel kernels are launched from two threads at once,
+# as when matching on two columns, so kernel launches are serialised
+NUMBA_LOCK = threading.Lock()
+
+@functools.lru_cache(maxsize=None)
+def load_numba_kernels():
+    '''
+    Compiles the Numba kernels on first use, caching the machine code to disk.
+    Numba is an optional dependency: returns None if it is not installed so callers fall back to NumPy.
+    '''
+    try:
+        import numba
+    except ImportError:
+        return None
+
+    # Note: kernels are launched from the daemon matching thread, where the TBB layer hangs interpreter shutdown
+    numba.config.THREADING_LAYER = 'workqueue'
+
+    @numba.njit(parallel=True, cache=True, fastmath=True)
+    def weighted_average(scores_1, scores_2, weight):
+        # Fuse the multiply, add and cast into a single parallel pass over the scores
+        out = np.empty_like(scores_1)
+        for i in numba.prange(scores_1.shape[0]):
+            out[i] = (np.uint16(scores_1[i]) * weight + np.uint16(scores_2[i]) * (256 - weight) + 128) >> 8
+        return out
+
+    @numba.njit(parallel=True, cache=True)
+    def best_matches(scores):
+        # Find the first highest score of each row and its column in a single pass, stopping early at a perfect match
+        best_cols = np.empty(scores.shape[0], dtype=np.intp)
+        best_scores = np.empty(scores.shape[0], dtype=np.uint8)
+        for i in numba.prange(scores.shape[0]):
+            best_col, best_score = 0, scores[i, 0]
+            for j in range(1, scores.shape[1]):
+                if best_score == 100:
+                    break
+                if scores[i, j] > best_score:
+                    best_col, best_score = j, scores[i, j]
+            best_cols[i], best_scores[i] = best_col, best_score
+        return best_cols, best_scores
+
+    return SimpleNamespace(weighted_average=weighted_average, best_matches=best_matches)
+
+
+def weighted_average(scores_1, scores_2, score_1_weight):
+    '''
+    Takes the weighted average of two score arrays.
+
+    Parameters
+    ----------
+    scores_1
+        First array of scores
+    scores_2
+        Second array of scores
+    score_1_weight
+        Weight between 0 and 1 placed on scores 1
+
+    Returns
+    -------
+        Array of uint8 scores, or of floats if either input has missing scores
+    '''
+    # Note: use integer weights out of 256, widening to uint16 only for the sum before rounding back to uint8
+    weight = round(score_1_weight * 256)
+
+    # Missing scores are NaN floats, round the same way and leave them missing
+    if scores_1.dtype != np.uint8 or scores_2.dtype != np.uint8:
+        return np.floor((scores_1 * weight + scores_2 * (256 - weight) + 128) / 256)
+
+    kernels = load_numba_kernels()
+    if kernels is not None:
+        with NUMBA_LOCK:
+            return kernels.weighted_average(scores_1, scores_2, weight)
+
+    weighted_sum = scores_1.astype(np.uint16) * weight + scores_2.astype(np.uint16) * (256 - weight)
+    return ((weighted_sum + 128) >> 8).astype(np.uint8)
+
+
+def best_matches(scores):
+    '''
+    Finds the first highest score in each row of a uint8 score matrix.
+
+    Parameters
+    ----------
+    scores
+        Matrix of scores, with a row for each string of dataset 1 and a column for each string of dataset 2
+
+    Returns
+    -------
+        Arrays of the column and score of the best match in each row
+    '''
+    kernels = load_numba_kernels()
+    if kernels is not None and scores.shape[1]:
+        with NUMBA_LOCK:
+            return kernels.best_matches(scores)
+
+    best_cols = scores.argmax(axis=1)
+    return best_cols, scores[np.arange(len(scores)), best_cols]
+
 # %% Define app class
 
 class MatchingTool:
@@ -117,6 +288,9 @@ class MatchingTool:
         self.root.title("Fuzzy Matching Tool")
         self.root.geometry("550x600")
 
+        # Import the data libraries while the widgets are built
+        threading.Thread(target=load_libraries, daemon=True).start()
+
         # Initialise variables 
         self.dataset_1_path = ctk.StringVar()                               # Path to dataset 1
         self.dataset_2_path = ctk.StringVar()                               # Path to dataset 2
@@ -132,10 +306,21 @@ class MatchingTool:
         self.multi_match_var = ctk.IntVar(value=0)                          # Dummy taking value 1 when matching on multiple columns            
         self.score_method_var = ctk.StringVar(value="Score Method")         # Formula for combining scores when matching on multiple columns (maximum, minimum or weighted average)
         self.weight_var = ctk.DoubleVar(value = 0.5)                        # Weight on score 1 when calculating weighted average
-        self.dataset_cache = {}                                             # Cache to store dimensions of dataset for display on hover
+        self.dataset_cache = {}                                             # Cache to store dimensions and column names of dataset for display on hover
+        self.data_cache = {}                                                # Datasets read for matching, reused on later runs until the file is modified
         self.is_advanced_visible = False                                    # Boolean for displaying advanced options window
+        self.hover_after_id = None                                          # Pending hover label update, cancelled if the mouse moves on first
+        self.display_names = {}                                             # Button label for each path variable, keyed by variable name as Tk variables are unhashable
+        self.progress_lock = threading.Lock()                               # Guards progress updates, as multi matching scores both columns at once
+        self.score_cache = OrderedDict()                                    # Score matrices of distinct strings from earlier runs, least recently used first
+        self.score_cache_lock = threading.Lock()                            # Guards the score cache, as multi matching scores both columns at once
         self.theme = "dark"                                                 # Colour scheme (light or dark)
         self.fact_switch_flag = ctk.IntVar(value=0)                         # Flag to toggle if animal facts are displayed on completion 
+        self.ascii_convert_flag = ctk.IntVar(value=0)                       # Flag to toggle converting match columns to ASCII
+        self.clean_flag = ctk.IntVar(value=0)                               # Flag to toggle preparing the output for manual checks
+        self.keep_columns_flag = ctk.IntVar(value=0)                        # Flag to toggle keeping all columns in the output
+        self.blocking_flag = ctk.IntVar(value=0)                            # Flag to toggle only scoring pairs sharing an uncommon token
+        self.is_advanced_built = False                                      # Boolean for whether the advanced options widgets have been created
 
         # Set theme
         ctk.set_appearance_mode(self.theme)
@@ -185,23 +370,15 @@ class MatchingTool:
         # Create radio buttons to select output type
         self.matching_title = ctk.CTkLabel(self.main_frame, text="Select Output Type", font=ctk.CTkFont(size=13, weight="bold")).pack(pady=5)
         
-        # Create a button for computing score for all combinations of strings
-        self.output_button_all = ctk.CTkRadioButton(self.main_frame, 
-                                                    text="All Possible Combinations",
-                                                    variable=self.output_type_var, 
-                                                    value=1, 
-                                                    radiobutton_width=18, 
-                                                    radiobutton_height=18, 
-                                                    border_width_checked=5)
+        # Shared styling for all radio buttons
+        radio_style = dict(radiobutton_width=18, radiobutton_height=18, border_width_checked=5)
+
+        # Create buttons for computing score for all combinations of strings, and only the highest score for each entry
+        self.output_button_all, self.output_button_best = [
+            ctk.CTkRadioButton(self.main_frame, text=text, variable=self.output_type_var, value=value, **radio_style)
+            for text, value in [("All Possible Combinations", 1), ("Highest Matches Only", 2)]
+        ]
         self.output_button_all.pack()
-        
-        # Create a button for computing only the highest score for each entry
-        self.output_button_best = ctk.CTkRadioButton(self.main_frame,
-                                                      text="Highest Matches Only", 
-                                                      variable=self.output_type_var, 
-                                                      value=2, radiobutton_width=18, 
-                                                      radiobutton_height=18, 
-                                                      border_width_checked=5)
         self.output_button_best.pack()
         
         # Create a frame to store the radio button and spinbox for computing matches above a given threshold.
@@ -213,9 +390,7 @@ class MatchingTool:
                                                           text="Matches Above Threshold", 
                                                           variable=self.output_type_var, 
                                                           value=3, 
-                                                          radiobutton_width=18, 
-                                                          radiobutton_height=18, 
-                                                          border_width_checked=5)
+                                                          **radio_style)
         self.output_button_threshold.grid(row=0, column=0, padx=5)
 
         # Create spinbox to select threshold score
@@ -227,38 +402,9 @@ class MatchingTool:
                                            text="Select Matching Algorithm",
                                            font=ctk.CTkFont(size=13, weight="bold")).pack(pady=5)
 
-        # Create a button to select set ratio
-        self.matching_button_set = ctk.CTkRadioButton(self.main_frame, 
-                                                      text="Set Ratio", 
-                                                      variable=self.matching_type_var, 
-                                                      value=1, 
-                                                      radiobutton_width = 18, 
-                                                      radiobutton_height = 18, 
-                                                      border_width_checked=5).pack()
-        # Create a button to select sort ratio
-        self.matching_button_sort = ctk.CTkRadioButton(self.main_frame, 
-                                                       text="Sort Ratio", 
-                                                       variable=self.matching_type_var, 
-                                                       value=2, radiobutton_width = 18, 
-                                                       radiobutton_height = 18, 
-                                                       border_width_checked=5).pack()
-        
-        # Create a button to select the max of set and sort ratio
-        self.matching_button_max = ctk.CTkRadioButton(self.main_frame, 
-                                                      text="Max of (Set Ratio, Sort Ratio)", 
-                                                      variable=self.matching_type_var, 
-                                                      value=3, 
-                                                      radiobutton_width = 18, 
-                                                      radiobutton_height = 18, 
-                                                      border_width_checked=5).pack()
-        # Create a button to select quick ratio
-        self.matching_button_quick = ctk.CTkRadioButton(self.main_frame, 
-                                                        text="QRatio", 
-                                                        variable=self.matching_type_var, 
-                                                        value=4, 
-                                                        radiobutton_width = 18, 
-                                                        radiobutton_height = 18, 
-                                                        border_width_checked=5).pack()
+        # Create a button for each algorithm: set ratio, sort ratio, the max of set and sort ratio, and quick ratio
+        for text, value in [("Set Ratio", 1), ("Sort Ratio", 2), ("Max of (Set Ratio, Sort Ratio)", 3), ("QRatio", 4)]:
+            ctk.CTkRadioButton(self.main_frame, text=text, variable=self.matching_type_var, value=value, **radio_style).pack()
  
         # Create a progress bar to display progress of matching operation
         self.progress_bar = ctk.CTkProgressBar(self.main_frame, width=300)
@@ -273,59 +419,11 @@ class MatchingTool:
                                                  command=self.run_matching, width=200)
         self.run_matching_button.pack(pady=10)
 
-        # Create the advanced frame
-        self.advanced_frame = ctk.CTkFrame(self.root, width=500, height=500, fg_color=["gray92", "gray14"])
-
-        # Add a debugging window to the advanced frame
-        self.terminal_output_text = ctk.CTkTextbox(self.advanced_frame, width=450, height=250, wrap="word")
-
         # Redirect print statements (sys.standard out) and errors (sys.standard error) to the debug window
-        redirector = TextRedirector(self.terminal_output_text)
-        sys.stdout = redirector
-        sys.stderr = redirector
-
-        # Create toggle to enable/disable matching on 2 columns
-        self.multi_match_switch = ctk.CTkSwitch(self.advanced_frame, 
-                                                command = self.toggle_multi_match, 
-                                                text="2 Column Match")
-        
-        # Create dropdowns to set 2nd set of match columns
-        self.dataset_1_match_2_dropdown = ctk.CTkOptionMenu(self.advanced_frame, 
-                                                            variable= self.dataset_1_match_col_2, 
-                                                            values=["Match Column 2"])
-        
-        self.dataset_2_match_2_dropdown = ctk.CTkOptionMenu(self.advanced_frame, 
-                                                            variable= self.dataset_2_match_col_2, 
-                                                            values=["Match Column 2"])
-
-        # Create dropdown to select method of combining scores across match sets
-        self.combine_score_dropdown = ctk.CTkOptionMenu(self.advanced_frame, 
-                                                        variable=self.score_method_var, 
-                                                        values=["Maximum", "Minimum", "Weighted Average"])
-        
-        # Create a labeled slider to select the weight on score 1 when using weighted average
-        self.weight_1_slider = ctk.CTkSlider(self.advanced_frame, 
-                                             from_=0, 
-                                             to = 1, 
-                                             variable = self.weight_var, 
-                                             width = 100)
-        self.slider_label = ctk.CTkLabel(self.advanced_frame, text = "Score 1 Weight:")
-        self.slider_value = ctk.CTkLabel(self.advanced_frame, textvariable = self.weight_var)
-
-        # Create switches for quality of life toggles
-        self.fact_switch = ctk.CTkSwitch(self.advanced_frame,
-                                         text="Fuzzy animal fact",
-                                         variable=self.fact_switch_flag)
-        
-        self.ascii_convert_switch = ctk.CTkSwitch(self.advanced_frame,
-                                                 text="Convert to ASCII")
-        
-        self.clean_switch = ctk.CTkSwitch(self.advanced_frame,
-                                          text="Prep for manual checks")
-
-        self.keep_columns_switch = ctk.CTkSwitch(self.advanced_frame,
-                                                 text="Keep all columns")
-
+        # Note: the debug window is only created with the advanced options, until then output is buffered
+        self.redirector = TextRedirector()
+        sys.stdout = self.redirector
+        sys.stderr = self.redirector
 
         # Start the event loop
         self.root.mainloop()
@@ -388,64 +486,196 @@ class MatchingTool:
         # Remove dimensions when hover ends
         dataset_button.bind(
             "<Leave>", 
-            lambda event: dataset_button.configure(
-                text=os.path.basename(path_variable.get()) 
-                if path_variable.get() 
-                else f"Select Dataset {dataset_num}"
+            lambda event: self.schedule_button_text(
+                dataset_button,
+                self.display_names.get(str(path_variable), f"Select Dataset {dataset_num}")
             )
         )
 
+    def get_sidecar_path(self, file_path):
+        '''
+        Helper function to find the Parquet copy of an Excel file in the temp directory.
+        Keyed on path and modification time so edits to the source are picked up.
+        '''
+        key = f"{os.path.abspath(file_path)}{os.path.getmtime(file_path)}".encode()
+        return os.path.join(tempfile.gettempdir(), f"fmt_{hashlib.md5(key).hexdigest()}.parquet")
+
+    def read_dataset_info(self, file_path):
+        '''
+        Reads the dimensions and column names of a dataset without loading its contents.
+
+        Parameters
+        ----------
+        file_path
+            Path to dataset (xlsx, csv or dta)
+
+        Returns
+        -------
+            The number of rows and the list of column names
+
+        Raises
+        ------
+        ValueError
+            If the file format is unsupported.
+        '''
+        if file_path.endswith('.csv'):
+            columns = pd.read_csv(file_path, nrows=0).columns.tolist()
+            # Count rows by parsing a single column, unlike counting lines this respects quoted line breaks
+            # Note: the multithreaded pyarrow parser is optional and rejects some files, fall back to the default parser
+            try:
+                rows = len(pd.read_csv(file_path, usecols=columns[:1], engine="pyarrow"))
+            except (ImportError, ValueError):
+                rows = len(pd.read_csv(file_path, usecols=[0]))
+
+        elif file_path.endswith('.xlsx'):
+            columns = pd.read_excel(file_path, nrows=0).columns.tolist()
+            # Read only mode takes the row count from the sheet dimensions rather than parsing every cell
+            workbook = load_workbook(file_path, read_only=True)
+            sheet_rows = workbook.worksheets[0].max_row
+            workbook.close()
+            # Some writers omit the sheet dimensions, in which case fall back to a full read
+            rows = sheet_rows - 1 if sheet_rows else len(self.read_dataset(file_path, columns[:1]))
+
+        elif file_path.endswith('.dta'):
+            # Note: pyreadstat is optional and can read the header alone, pandas has to read the full file
+            try:
+                import pyreadstat
+                _, meta = pyreadstat.read_dta(file_path, metadataonly=True)
+                columns, rows = meta.column_names, meta.number_rows
+            except ImportError:
+                df = pd.read_stata(file_path)
+                rows, columns = len(df), df.columns.tolist()
+
+        else:
+            raise ValueError(f"Unsupported file format for {file_path}.")
+
+        return rows, columns
+
+    def read_dataset(self, file_path, columns=None):
+        '''
+        Reads a dataset from disk. Excel files are slow to parse, so a Parquet copy is saved
+        to the temp directory on first read and used instead on later reads of the same file.
+
+        Parameters
+        ----------
+        file_path
+            Path to dataset (xlsx, csv or dta)
+        columns, optional
+            Columns to read, by default None reading all columns
+
+        Returns
+        -------
+            The dataframe
+
+        Raises
+        ------
+        ValueError
+            If the file format is unsupported.
+        '''
+        if file_path.endswith('.csv'):
+            # Note: the pyarrow parser is not used here, as it reads ISO dates as timestamps and large integers as floats,
+            # which would change the text being matched
+            return pd.read_csv(file_path, usecols=columns)
+        elif file_path.endswith('.dta'):
+            return pd.read_stata(file_path, columns=columns)
+        elif not file_path.endswith('.xlsx'):
+            raise ValueError(f"Unsupported file format for {file_path}.")
+
+        sidecar_path = self.get_sidecar_path(file_path)
+        if os.path.exists(sidecar_path):
+            try:
+                return pd.read_parquet(sidecar_path, columns=columns)
+            except (ImportError, OSError, ValueError):
+                pass
+
+        # Note: the full sheet is parsed even if only some columns are needed, so read everything and save the copy
+        # The Rust based calamine reader is much faster than openpyxl, but optional
+        try:
+            df = pd.read_excel(file_path, engine="calamine")
+        except ImportError:
+            df = pd.read_excel(file_path)
+
+        # Note: pyarrow is optional, and columns of mixed types cannot be written to Parquet. Skip the copy in either case
+        try:
+            df.to_parquet(sidecar_path, index=False)
+        except (ImportError, OSError, ValueError, TypeError):
+            self.debug_message(f"Could not cache {file_path} as Parquet")
+
+        return df if columns is None else df[columns]
+
+    def read_cached_dataset(self, file_path, columns=None):
+        '''
+        Helper function to read a dataset, reusing the copy read on a previous run if the file is unchanged.
+        A copy of all columns serves any selection, otherwise the same columns must have been read.
+        '''
+        modified_time = os.path.getmtime(file_path)
+        cached = self.data_cache.get(file_path)
+        if cached is not None:
+            cached_time, cached_columns, cached_df = cached
+            if cached_time == modified_time and (cached_columns is None or cached_columns == columns):
+                self.debug_message(f"Reusing data read from {file_path}")
+                # Note: copy so converting the match columns does not alter the cached data
+                return cached_df.copy() if columns is None else cached_df[columns].copy()
+
+        df = self.read_dataset(file_path, columns)
+        self.data_cache[file_path] = (modified_time, columns, df)
+        return df.copy()
+
     def browse_file(self, path, label, is_output=False):
         '''
-        Loads the selected dataset and replaces the button label with the filename. 
-        Caches dataset dimensions for display later.
+        Reads the column names of the selected dataset and replaces the button label with the filename. 
+        Caches dataset dimensions and column names for display later, the data itself is loaded when matching runs.
 
         Parameters
         ----------
         path
-            Path to input or output file (xlsx, csv or dta)
+            Path to input or output file (xlsx, csv or dta, and parquet for the output)
         label
             Button to update the label of.
         is_output, optional
             Boolean indicating whether the button is the output path, by default False.
-            If the file is the output path dimensions are not cached.
+            If the file is the output path nothing is cached.
         '''
-        # Grab file path from the interactive dialog. Set valid filetypes
-        file_path = ctk.filedialog.askopenfilename(filetypes=[("Data file", "*.csv"),
-                                                                ("Data file", "*.xlsx"),
-                                                                ("Data file", "*.dta")])
+        # Grab file path from the interactive dialog. Set valid filetypes, the output can also be Parquet
+        filetypes = [("Data file", "*.csv"), ("Data file", "*.xlsx"), ("Data file", "*.dta")]
+        if is_output:
+            filetypes.append(("Data file", "*.parquet"))
+        file_path = ctk.filedialog.askopenfilename(filetypes=filetypes)
         if file_path:
+            # Drop any data read for matching from the file being replaced
+            if not is_output:
+                self.data_cache.pop(path.get(), None)
+
             # Set the path to the selected file
             path.set(file_path)
-            # Label the button according to the file path
-            label.configure(text=os.path.basename(file_path), text_color="white")
+            # Label the button according to the file path, caching the label to restore after hover
+            self.display_names[str(path)] = os.path.basename(file_path)
+            label.configure(text=self.display_names[str(path)], text_color="white")
             
-            # For input datasets only, cache dimensions when imported
+            # For input datasets only, cache dimensions and column names when imported
             if not is_output:
                 if file_path not in self.dataset_cache:   
-                    if file_path.endswith('.xlsx'):
-                        df = pd.read_excel(file_path)
-                    elif file_path.endswith('.csv'):
-                        df = pd.read_csv(file_path)
-                    elif file_path.endswith('.dta'):
-                        df = pd.read_stata(file_path)
-                    columns = df.columns.tolist()
+                    load_libraries()
+                    rows, columns = self.read_dataset_info(file_path)
 
-                    self.dataset_cache[file_path] = df.shape 
+                    self.dataset_cache[file_path] = ((rows, len(columns)), columns)
 
                     dropdown_id = self.dataset_1_id_dropdown if path == self.dataset_1_path else self.dataset_2_id_dropdown
                     dropdown_match_1 = self.dataset_1_match_1_dropdown if path == self.dataset_1_path else self.dataset_2_match_1_dropdown
-                    dropdown_match_2 = self.dataset_1_match_2_dropdown if path == self.dataset_1_path else self.dataset_2_match_2_dropdown
+                    match_col_2 = self.dataset_1_match_col_2 if path == self.dataset_1_path else self.dataset_2_match_col_2
 
                     # Reset the dropdowns
                     dropdown_id.set("ID Column")
                     dropdown_match_1.set("Match Column")
-                    dropdown_match_2.set("Match Column 2")
+                    match_col_2.set("Match Column 2")
 
                     # Replace the dropdowns options
+                    # Note: the second match column dropdown only exists once the advanced options have been opened
                     dropdown_id.configure(values=columns)
                     dropdown_match_1.configure(values=columns)
-                    dropdown_match_2.configure(values=columns)
+                    if self.is_advanced_built:
+                        dropdown_match_2 = self.dataset_1_match_2_dropdown if path == self.dataset_1_path else self.dataset_2_match_2_dropdown
+                        dropdown_match_2.configure(values=columns)
 
             self.debug_message(f"Path set: {file_path}")
 
@@ -456,8 +686,24 @@ class MatchingTool:
         file_path = path_var.get()
         if file_path:
             if file_path in self.dataset_cache:
-                rows, cols = self.dataset_cache[file_path]
-                label.configure(text=f"{cols} columns, {rows} rows")
+                (rows, cols), _ = self.dataset_cache[file_path]
+                self.schedule_button_text(label, f"{cols} columns, {rows} rows")
+
+    def schedule_button_text(self, label, text):
+        '''
+        Helper function to update a button label shortly after a hover event.
+        Cancels any update still pending, so sweeping the mouse across the buttons only redraws once it settles.
+        '''
+        if self.hover_after_id is not None:
+            self.root.after_cancel(self.hover_after_id)
+
+        def update_text():
+            self.hover_after_id = None
+            # Skip the redraw if the label already shows this text
+            if label.cget("text") != text:
+                label.configure(text=text)
+
+        self.hover_after_id = self.root.after(100, update_text)
 
     def toggle_theme(self):
         '''
@@ -482,10 +728,98 @@ class MatchingTool:
 
         self.debug_message(f"Matching on single variable: {bool(new_state)}")
 
+    def build_advanced_options(self):
+        '''
+        Creates the advanced options pane. Built when first opened rather than at launch, as most runs never open it.
+        '''
+        # Create the advanced frame
+        self.advanced_frame = ctk.CTkFrame(self.root, width=500, height=500, fg_color=["gray92", "gray14"])
+
+        # Add a debugging window to the advanced frame, and write any output so far to it
+        self.terminal_output_text = ctk.CTkTextbox(self.advanced_frame, width=450, height=250, wrap="word")
+        self.redirector.attach(self.terminal_output_text)
+
+        # Create toggle to enable/disable matching on 2 columns
+        self.multi_match_switch = ctk.CTkSwitch(self.advanced_frame, 
+                                                command = self.toggle_multi_match, 
+                                                text="2 Column Match")
+        
+        # Create dropdowns to set 2nd set of match columns
+        self.dataset_1_match_2_dropdown = ctk.CTkOptionMenu(self.advanced_frame, 
+                                                            variable= self.dataset_1_match_col_2, 
+                                                            values=["Match Column 2"])
+        
+        self.dataset_2_match_2_dropdown = ctk.CTkOptionMenu(self.advanced_frame, 
+                                                            variable= self.dataset_2_match_col_2, 
+                                                            values=["Match Column 2"])
+
+        # Create dropdown to select method of combining scores across match sets
+        self.combine_score_dropdown = ctk.CTkOptionMenu(self.advanced_frame, 
+                                                        variable=self.score_method_var, 
+                                                        values=["Maximum", "Minimum", "Weighted Average"])
+        
+        # Create a labeled slider to select the weight on score 1 when using weighted average
+        self.weight_1_slider = ctk.CTkSlider(self.advanced_frame, 
+                                             from_=0, 
+                                             to = 1, 
+                                             variable = self.weight_var, 
+                                             width = 100)
+        self.slider_label = ctk.CTkLabel(self.advanced_frame, text = "Score 1 Weight:")
+        self.slider_value = ctk.CTkLabel(self.advanced_frame, textvariable = self.weight_var)
+
+        # Create switches for quality of life toggles
+        self.fact_switch = ctk.CTkSwitch(self.advanced_frame,
+                                         text="Fuzzy animal fact",
+                                         variable=self.fact_switch_flag)
+        
+        self.ascii_convert_switch = ctk.CTkSwitch(self.advanced_frame,
+                                                 text="Convert to ASCII",
+                                                 variable=self.ascii_convert_flag)
+        
+        self.clean_switch = ctk.CTkSwitch(self.advanced_frame,
+                                          text="Prep for manual checks",
+                                          variable=self.clean_flag)
+
+        self.keep_columns_switch = ctk.CTkSwitch(self.advanced_frame,
+                                                 text="Keep all columns",
+                                                 variable=self.keep_columns_flag)
+
+        # Create toggle to only score pairs sharing an uncommon token
+        self.blocking_switch = ctk.CTkSwitch(self.advanced_frame,
+                                             text="Blocking",
+                                             variable=self.blocking_flag)
+
+        # Fill the second match column dropdowns for any datasets already selected
+        for path, dropdown in [(self.dataset_1_path, self.dataset_1_match_2_dropdown),
+                               (self.dataset_2_path, self.dataset_2_match_2_dropdown)]:
+            if path.get() in self.dataset_cache:
+                _, columns = self.dataset_cache[path.get()]
+                dropdown.configure(values=columns)
+
+        # Place all the additional settings
+        self.terminal_output_text.grid(row = 0, column = 0, columnspan = 3, pady = 10)
+        self.multi_match_switch.grid(row=1, column=0, padx=5, pady=5, sticky="w")
+        self.dataset_1_match_2_dropdown.grid(row=1, column=1, padx=5, pady=5, sticky="w")
+        self.dataset_2_match_2_dropdown.grid(row=1, column=2, padx=5, pady=5, sticky="w")
+        self.combine_score_dropdown.grid(row=2, column=0, padx=5, pady=5, sticky="w")
+        self.weight_1_slider.grid(row=2, column=1, padx=5, pady=5, columnspan=1)  
+        self.slider_label.grid(row=2, column=2, padx=5, pady=5, sticky ="w") 
+        self.slider_value.grid(row=2, column=2, padx=5, pady=5, sticky="e") 
+        self.blocking_switch.grid(row=3, column=0, padx=5, pady=5, sticky="w")
+        self.fact_switch.grid(row=3, column=1, columnspan=3, pady=5, sticky ="w")
+        self.ascii_convert_switch.grid(row=4, column=1, columnspan=3, pady=5, sticky ="w")
+        self.clean_switch.grid(row=5, column=1, columnspan=3, pady=5, sticky ="w")
+        self.keep_columns_switch.grid(row=6, column=1, columnspan=3, pady=5, sticky ="w")
+
+        self.is_advanced_built = True
+
     def toggle_advanced_options(self):
         '''
         Helper function to toggle visibility of the advanced options pane.
         '''
+        if not self.is_advanced_built:
+            self.build_advanced_options()
+
         if self.is_advanced_visible:
 
             # Shrink the window and forget the frame
@@ -498,20 +832,6 @@ class MatchingTool:
             self.root.geometry("1050x600")
             self.advanced_frame.place(relx=0.97, y=50,  anchor = "ne")
 
-            # Place all the additional settings
-            self.terminal_output_text.grid(row = 0, column = 0, columnspan = 3, pady = 10)
-            self.multi_match_switch.grid(row=1, column=0, padx=5, pady=5, sticky="w")
-            self.dataset_1_match_2_dropdown.grid(row=1, column=1, padx=5, pady=5, sticky="w")
-            self.dataset_2_match_2_dropdown.grid(row=1, column=2, padx=5, pady=5, sticky="w")
-            self.combine_score_dropdown.grid(row=2, column=0, padx=5, pady=5, sticky="w")
-            self.weight_1_slider.grid(row=2, column=1, padx=5, pady=5, columnspan=1)  
-            self.slider_label.grid(row=2, column=2, padx=5, pady=5, sticky ="w") 
-            self.slider_value.grid(row=2, column=2, padx=5, pady=5, sticky="e") 
-            self.fact_switch.grid(row=3, column=1, columnspan=3, pady=5, sticky ="w")
-            self.ascii_convert_switch.grid(row=4, column=1, columnspan=3, pady=5, sticky ="w")
-            self.clean_switch.grid(row=5, column=1, columnspan=3, pady=5, sticky ="w")
-            self.keep_columns_switch.grid(row=6, column=1, columnspan=3, pady=5, sticky ="w")
-
         # Flip the boolean
         self.is_advanced_visible = not self.is_advanced_visible
 
@@ -524,55 +844,62 @@ class MatchingTool:
         -------
             Boolean whether to continue execution
         '''
+        # Read each setting once, as every get() is a call into the Tcl interpreter
+        (dataset_1_path, dataset_2_path, output_path,
+         dataset_1_id_col, dataset_2_id_col,
+         dataset_1_match_col_1, dataset_2_match_col_1,
+         dataset_1_match_col_2, dataset_2_match_col_2,
+         output_type, multi_match, score_method) = (variable.get() for variable in (
+            self.dataset_1_path, self.dataset_2_path, self.output_path,
+            self.dataset_1_id_col, self.dataset_2_id_col,
+            self.dataset_1_match_col_1, self.dataset_2_match_col_1,
+            self.dataset_1_match_col_2, self.dataset_2_match_col_2,
+            self.output_type_var, self.multi_match_var, self.score_method_var))
+
         # Check if Dataset 1 path is provided
-        if not self.dataset_1_path.get():
+        if not dataset_1_path:
             self.show_error("Please select Dataset 1.")
             return False
     
         # Check if Dataset 2 path is provided
-        if not self.dataset_2_path.get():
+        if not dataset_2_path:
             self.show_error("Please select Dataset 2.")
             return False
     
         # Check if Output path is provided
-        if not self.output_path.get():
+        if not output_path:
             self.show_error("Please select an output file.")
             return False
     
         # Check if Dataset 1 ID column is selected
-        if not self.dataset_1_id_col.get() or self.dataset_1_id_col.get() == "ID Column":
+        if not dataset_1_id_col or dataset_1_id_col == "ID Column":
             self.show_error("Please select an ID column for Dataset 1.")
             return False
     
         # Check if Dataset 2 ID column is selected
-        if not self.dataset_2_id_col.get() or self.dataset_2_id_col.get() == "ID Column":
+        if not dataset_2_id_col or dataset_2_id_col == "ID Column":
             self.show_error("Please select an ID column for Dataset 2.")
             return False
     
         # Check if Dataset 1 Match column is selected
-        if not self.dataset_1_match_col_1.get() or self.dataset_1_match_col_1.get() == "Match Column":
+        if not dataset_1_match_col_1 or dataset_1_match_col_1 == "Match Column":
             self.show_error("Please select a match column for Dataset 1.")
             return False
     
         # Check if Dataset 2 Match column is selected
-        if not self.dataset_2_match_col_1.get() or self.dataset_2_match_col_1.get() == "Match Column":
+        if not dataset_2_match_col_1 or dataset_2_match_col_1 == "Match Column":
             self.show_error("Please select a match column for Dataset 2.")
             return False
     
         # Assert no duplicate columns selected
-        selected_columns = {
-            self.dataset_1_match_col_1.get(),
-            self.dataset_1_id_col.get(),
-            self.dataset_2_match_col_1.get(),
-            self.dataset_2_id_col.get(),
-        }
+        selected_columns = {dataset_1_match_col_1, dataset_1_id_col, dataset_2_match_col_1, dataset_2_id_col}
         if len(selected_columns) < 4:
             self.show_error("Please ensure all primary columns are distinct.")
             return False
 
                 
         # Checks for threshold matching:
-        if self.output_type_var.get():
+        if output_type:
             try:
                 threshold_value = float(self.score_threshold_spinbox.get())
 
@@ -588,35 +915,33 @@ class MatchingTool:
                 return False
         
         # Checks for multi matching.
-        if self.multi_match_var.get():
+        if multi_match:
              
              # Check if Dataset 1 Match column 2 is selected.
-             if not self.dataset_1_match_col_2.get() or self.dataset_1_match_col_2.get() == "Match Column 2":
+             if not dataset_1_match_col_2 or dataset_1_match_col_2 == "Match Column 2":
                 self.show_error("Please select the second match column for Dataset 1.")
                 return False
              
             # Check if Dataset 2 Match column 2 is selected.
-             if not self.dataset_2_match_col_2.get() or self.dataset_2_match_col_2.get() == "Match Column 2":
+             if not dataset_2_match_col_2 or dataset_2_match_col_2 == "Match Column 2":
                 self.show_error("Please select the second match column for Dataset 2.")
                 return False
 
             # Check if combination method selected.
-             if not self.score_method_var.get() or self.score_method_var.get() == "Score Method":
+             if not score_method or score_method == "Score Method":
                 self.show_error("Please select a method for combining match scores.")
                 return False
              
              # Check if additional match columns are distinct from all the others.
-             selected_columns.update({
-                self.dataset_1_match_col_2.get(),
-                self.dataset_2_match_col_2.get(),
-            })
+             selected_columns.update({dataset_1_match_col_2, dataset_2_match_col_2})
              if len(selected_columns) < 6:
                 self.show_error("Please ensure all secondary columns are distinct.")
                 return False
 
         return True
 
-    def load_dataset(self, dataset_path, id_col, match_col_1, multi_match, match_col_2 = "" ):
+    def load_dataset(self, dataset_path, id_column, match_col_1, multi_match, match_col_2 = "", keep_columns = False,
+                     ascii_convert = False):
         '''
         Loads dataset from path and returns the columns relevant for matching
 
@@ -624,7 +949,7 @@ class MatchingTool:
         ----------
         dataset_path
             Path to dataset
-        id_col
+        id_column
             ID column of the given dataset
         match_col_1
             Primary match column of the given dataset
@@ -632,27 +957,30 @@ class MatchingTool:
             Whether multi match is enabled, should another column be read in?
         match_col_2, optional
             Secondary match column of the given dataset if required, by default ""
+        keep_columns, optional
+            Whether to read all columns to keep in the output, by default False reading only the ID and match columns
+        ascii_convert, optional
+            Whether to convert the match columns to ASCII, by default False
 
         Returns
         -------
             The dataframe, the number of rows, and the relevant columns.
             Also contains all other columns not relevant for matching to include if desired.
-        '''
 
-        # Read in data
-        if dataset_path.endswith('.xlsx'):
-            df = pd.read_excel(dataset_path)
-        elif dataset_path.endswith('.csv'):
-            df = pd.read_csv(dataset_path)
-        elif dataset_path.endswith('.dta'):
-            df = pd.read_stata(dataset_path)
-        else:
-            self.show_error(f"Unsupported file format for {dataset_path}.")
-            return None, None, None, None
+        Raises
+        ------
+        ValueError
+            If the ID column is not unique.
+            Raised rather than shown so the worker thread can report it via the progress queue.
+        '''
 
-        # Retrieve cached row data
-        rows, _ = self.dataset_cache[dataset_path]
-        id_column = id_col.get()
+        # Read in data, only reading the columns needed for matching unless the rest are kept
+        columns = None
+        if not keep_columns:
+            columns = list(dict.fromkeys([id_column, match_col_1, match_col_2] if multi_match and match_col_2
+                                         else [id_column, match_col_1]))
+        df = self.read_cached_dataset(dataset_path, columns)
+        rows = len(df)
 
         # Convert all match columns to strings
         df[match_col_1] = df[match_col_1].astype(str)
@@ -660,15 +988,14 @@ class MatchingTool:
             df[match_col_2] = df[match_col_2].astype(str)
         
         # Attempt ascii conversion if toggled
-        if self.ascii_convert_switch.get():
-            df[match_col_1] = df[match_col_1].apply(unidecode)
+        if ascii_convert:
+            df[match_col_1] = self.convert_to_ascii(df[match_col_1])
             if multi_match and match_col_2:
-                df[match_col_2] = df[match_col_2].apply(unidecode)
+                df[match_col_2] = self.convert_to_ascii(df[match_col_2])
 
         # Isid: Check if id_column is unique
-        if df[id_column].duplicated().any():
-            self.show_error(f"Error: The ID column '{id_column}' contains duplicates.")
-            return None, None, None, None
+        if not df[id_column].is_unique:
+            raise ValueError(f"Error: The ID column '{id_column}' contains duplicates.")
 
         # Define columns to exclude from 'other'
         exclude_cols = {match_col_1, match_col_2} if multi_match else {match_col_1}
@@ -677,6 +1004,32 @@ class MatchingTool:
         self.debug_message(f"Dataset {dataset_path} loaded")
         return df, rows, id_column, match_col_1, match_col_2 if multi_match else None, other_cols
         
+    def convert_to_ascii(self, series):
+        '''
+        Converts a column of strings to ASCII in one vectorised pass.
+        Accents are split from their letters (NFKD) and dropped when encoding.
+        Unidecode is only used for entries with characters that do not decompose, such as non Latin scripts.
+
+        Parameters
+        ----------
+        series
+            Series of strings to convert
+
+        Returns
+        -------
+            The converted series
+        '''
+        decomposed = series.str.normalize('NFKD')
+
+        # Flag entries with non ASCII characters remaining, other than the combining accents
+        needs_unidecode = decomposed.str.contains('[^\\x00-\\x7f\u0300-\u036f]', na=False)
+
+        converted = decomposed.str.encode('ascii', 'ignore').str.decode('ascii')
+
+        # Call unidecode from a plain list comprehension, skipping the per call overhead of Series.apply
+        converted[needs_unidecode] = [unidecode(text) for text in series[needs_unidecode].tolist()]
+        return converted
+
     def get_scorer(self):
         '''
         Helper function to return the desired matching algorithm.
@@ -685,15 +1038,13 @@ class MatchingTool:
         -------
             RF Scorer object corresponding to the algorithm specified
         '''
-        selected_matching_type = self.matching_type_var.get()
-        if selected_matching_type == 1:
-            return rf.fuzz.token_set_ratio
-        elif selected_matching_type == 2:
-            return rf.fuzz.token_sort_ratio
-        elif selected_matching_type == 3:
-            return rf.fuzz.token_ratio
-        elif selected_matching_type == 4:
-            return rf.fuzz.QRatio
+        # Note: token_ratio computes max(set ratio, sort ratio) natively. Never pass a Python function as the scorer,
+        # as cdist would then call back into Python for every pair
+        scorers = {1: rf.fuzz.token_set_ratio,
+                   2: rf.fuzz.token_sort_ratio,
+                   3: rf.fuzz.token_ratio,
+                   4: rf.fuzz.QRatio}
+        return scorers[self.matching_type_var.get()]
 
     def setup_tasks(self, dataset_1_rows):
         '''
@@ -707,16 +1058,17 @@ class MatchingTool:
         Returns
         -------
             Total number of tasks
-            Threshold to update the progress bar (every 5% of the total)
+            Threshold to update the progress bar (every 10% of the total)
             Desired output type (All combos, threshold, best)
         '''
         selected_output_type = self.output_type_var.get()
         total_tasks = dataset_1_rows
-        update_threshold = round(total_tasks, -1) * 0.1
+        # Note: computed once here as a whole number of rows, at least 1 so small datasets still update
+        update_threshold = max(1, total_tasks // 10)
 
         return total_tasks, update_threshold, selected_output_type
 
-    def update_progress(self, update_threshold, total_tasks):
+    def update_progress(self, update_threshold, total_tasks, steps=1):
         '''
         Put progress to the progress queue
 
@@ -726,21 +1078,182 @@ class MatchingTool:
             Cutoff for updating progress
         total_tasks
             Total number of tasks to perform
+        steps, optional
+            Number of tasks completed since the last update, by default 1
+        '''
+        with self.progress_lock:
+            # Track progress
+            previous_progress = self.current_progress
+            self.current_progress += steps
+            # Update progress if a threshold has been passed, or the task has completed
+            if self.current_progress // update_threshold != previous_progress // update_threshold or self.current_progress == total_tasks:
+                # Put progress to the queue
+                self.progress_queue.put((total_tasks, self.current_progress))
+
+
+    def build_block_index(self, series):
+        '''
+        Builds an inverted index from each token to the rows of the series containing it.
+        Tokens found in too many rows are dropped, as sharing them says little about a match.
+
+        Parameters
+        ----------
+        series
+            Series of strings to index
+
+        Returns
+        -------
+            Dictionary mapping each remaining token to a list of row positions
+        '''
+        block_index = defaultdict(list)
+        for row, tokens in enumerate(self.tokenise_for_blocking(series)):
+            for token in tokens:
+                block_index[token].append(row)
+
+        # Discard stopwords such as "the" or "ltd"
+        max_rows = max(BLOCK_MIN_ROWS, BLOCK_MAX_SHARE * len(series))
+        return {token: rows for token, rows in block_index.items() if len(rows) <= max_rows}
+
+    def tokenise_for_blocking(self, series):
+        '''
+        Helper function to split each string into a set of lowercase ASCII tokens.
+        Missing values have no tokens.
+        '''
+        return [set(unidecode(text).lower().split()) if isinstance(text, str) else set() for text in series]
+
+    def get_block_candidates(self, series_1, series_2):
+        '''
+        Finds the rows of series 2 sharing at least one uncommon token with each row of series 1.
+
+        Parameters
+        ----------
+        series_1
+            Series of strings from dataset 1
+        series_2
+            Series of strings from dataset 2, used to build the blocking index
+
+        Returns
+        -------
+            A list containing a sorted array of candidate row positions in series 2 for each row of series 1
+        '''
+        block_index = self.build_block_index(series_2)
+
+        candidates = []
+        for tokens in self.tokenise_for_blocking(series_1):
+            postings = [block_index[token] for token in tokens if token in block_index]
+            candidates.append(np.unique(np.concatenate(postings)) if postings else np.empty(0, dtype=np.intp))
+
+        self.debug_message(f"Blocking kept {sum(map(len, candidates))} of {len(series_1) * len(series_2)} pairs")
+        return candidates
+
+    def score_candidates(self, queries, choices, scorer, threshold_value, candidates, total_tasks, update_threshold, workers=-1):
+        '''
+        Scores each row of dataset 1 against its candidate rows of dataset 2 only.
+        Each row is a single query, which cdist cannot split across cores, so blocks of rows are scored in parallel
+        threads instead. RapidFuzz releases the GIL while scoring.
+
+        Returns
+        -------
+            Arrays of dataset 1 rows, dataset 2 rows and scores for every candidate pair
+        '''
+        def score_block(block_start, block_end):
+            rows, cols, pair_scores = [], [], []
+            for i in range(block_start, block_end):
+                row_candidates = candidates[i]
+                if len(row_candidates):
+                    # Note: index with plain integers, indexing a list with NumPy integers is several times slower
+                    row_scores = rf.process.cdist([queries[i]], [choices[j] for j in row_candidates.tolist()], scorer=scorer,
+                                                  score_cutoff=threshold_value, dtype=np.uint8, workers=1)[0]
+                    rows.append(np.full(len(row_candidates), i))
+                    cols.append(row_candidates)
+                    pair_scores.append(row_scores)
+
+                # Update progress
+                self.update_progress(update_threshold, total_tasks)
+
+            return rows, cols, pair_scores
+
+        # Split the rows into a few blocks per thread so uneven candidate counts still balance out
+        threads = workers if workers > 0 else (os.cpu_count() or 1)
+        rows_per_block = max(1, math.ceil(len(candidates) / (threads * 4)))
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            futures = [executor.submit(score_block, block_start, min(block_start + rows_per_block, len(candidates)))
+                       for block_start in range(0, len(candidates), rows_per_block)]
+
+        # Join the blocks back together in row order
+        rows, cols, pair_scores = [np.empty(0, dtype=np.intp)], [np.empty(0, dtype=np.intp)], [np.empty(0, dtype=np.uint8)]
+        for future in futures:
+            block_rows, block_cols, block_scores = future.result()
+            rows.extend(block_rows)
+            cols.extend(block_cols)
+            pair_scores.extend(block_scores)
+
+        return np.concatenate(rows), np.concatenate(cols), np.concatenate(pair_scores)
+
+    def select_best_candidates(self, rows, cols, pair_scores, dataset_1_rows):
+        '''
+        Keeps the highest scoring candidate pair for each row of dataset 1.
+        Ties go to the first candidate, and rows without candidates are kept with no match (index -1).
+        '''
+        # Sort by row, then score highest to lowest, then candidate position
+        order = np.lexsort((cols, -pair_scores.astype(np.int16), rows))
+        rows, cols, pair_scores = rows[order], cols[order], pair_scores[order]
+
+        # Keep the first pair of each row
+        first = np.ones(len(rows), dtype=bool)
+        first[1:] = rows[1:] != rows[:-1]
+        rows, cols, pair_scores = rows[first], cols[first], pair_scores[first]
+
+        # Add back any rows without candidates so all rows from df 1 still appear
+        missing = np.setdiff1d(np.arange(dataset_1_rows), rows)
+        rows = np.concatenate([rows, missing])
+        cols = np.concatenate([cols, np.full(len(missing), -1)])
+        pair_scores = np.concatenate([pair_scores, np.zeros(len(missing), dtype=np.uint8)])
+
+        order = np.argsort(rows, kind="stable")
+        return rows[order], cols[order], pair_scores[order]
+
+    def split_tokens(self, text):
+        '''
+        Helper function to split a string into tokens on whitespace, the same way RapidFuzz does.
+        '''
+        # Note: Python always splits on no-break space and next line, RapidFuzz only does for strings beyond Latin-1
+        if ('\xa0' in text or '\x85' in text) and max(text) <= '\xff':
+            return [token for token in LATIN_1_SEPARATORS.split(text) if token]
+        return text.split()
+
+    def sort_tokens(self, strings):
+        '''
+        Helper function to sort the whitespace separated tokens of each string. Missing values are left unchanged.
+        '''
+        return [" ".join(sorted(self.split_tokens(text))) if isinstance(text, str) else text for text in strings]
+
+    def sort_by_length(self, codes, uniques, missing):
+        '''
+        Reorders distinct strings from shortest to longest, relabelling the row codes and missing value positions to match.
+
+        Returns
+        -------
+            The new codes, distinct strings, missing value positions, and the sorted string lengths
         '''
-        # Track progress
-        self.current_progress += 1
-        # Update progress if at the threshold, or the task has completed
-        if self.current_progress % update_threshold == 0 or self.current_progress == round(total_tasks,-1) or self.current_progress == total_tasks:
-            # Put progress to the queue
-            self.progress_queue.put((total_tasks, self.current_progress))
+        lengths = np.array([len(text) if isinstance(text, str) else 0 for text in uniques], dtype=np.int64)
+        order = np.argsort(lengths, kind="stable")
+        new_positions = np.empty_like(order)
+        new_positions[order] = np.arange(len(order))
+        return new_positions[codes], [uniques[k] for k in order], new_positions[missing], lengths[order]
 
+    def expand_ranges(self, starts, counts):
+        '''
+        Helper function to concatenate the ranges starts[k] to starts[k] + counts[k] - 1 into one index array.
+        '''
+        offsets = starts - np.cumsum(counts) + counts
+        return np.repeat(offsets, counts) + np.arange(counts.sum())
 
     def generate_matches(self, selected_output_type, dataset_1_df, dataset_2_df,
                          match_col_1, match_col_2, id_col_1, id_col_2, scorer,
-                         total_tasks, update_threshold):
+                         total_tasks, update_threshold, candidates=None, workers=-1, threshold_value=None):
         '''
         Performs the matching operation.
-        Updates progress bar after every iteration through dataset 1. 
 
         Parameters
         ----------
@@ -764,96 +1277,279 @@ class MatchingTool:
             Total taks for display on progres bar
         update_threshold
             Threshold to update progress bar
+        candidates, optional
+            Candidate dataset 2 rows for each row of dataset 1 from blocking, by default None
+        workers, optional
+            Number of threads for RapidFuzz to score with, by default -1 using all cores
+        threshold_value, optional
+            Minimum score to keep when matching above threshold, by default None
 
         Returns
         -------
-            A list of lists containing the row by row matching results.
+            A DataFrame of the row by row matching results, with the two ID columns, the two match columns and the Match Score.
         '''
+        rows, cols, pair_scores = self.score_pairs(selected_output_type, dataset_1_df[match_col_1], dataset_2_df[match_col_2],
+                                                   scorer, total_tasks, update_threshold, candidates, workers, threshold_value)
 
-        # Initialise list to store output
-        data = []
-        
-        # 1 - All possible combinations
-        if selected_output_type == 1: 
-
-            # Loop over all combinations of entries in datsets 1 and 2
-            for i in range(len(dataset_1_df)):
-                for j in range(len(dataset_2_df)):
+        return self.build_matches(dataset_1_df[id_col_1], dataset_2_df[id_col_2], dataset_1_df[match_col_1],
+                                  dataset_2_df[match_col_2], rows, cols, pair_scores, 'Match Score')
 
-                    # Calculate match score of (i,j) and append to data
-                    score = scorer(dataset_1_df[match_col_1].iloc[i], dataset_2_df[match_col_2].iloc[j])
-                    data.append([dataset_1_df[id_col_1].iloc[i], dataset_2_df[id_col_2].iloc[j], 
-                                 dataset_1_df[match_col_1].iloc[i], dataset_2_df[match_col_2].iloc[j], score])
-                    
-                # Update progress
-                self.update_progress(update_threshold, total_tasks)
-        
-        # 2 - Highest matches only
-        elif selected_output_type == 2: 
+    def build_matches(self, id_values_1, id_values_2, match_values_1, match_values_2, rows, cols, pair_scores, score_col):
+        '''
+        Helper function to build the output DataFrame by selecting the matched positions from each column at once.
+        A dataset 2 position of -1 marks a row without candidates, and gives a missing value.
+        '''
+        return pd.DataFrame({id_values_1.name: id_values_1.array.take(rows),
+                             id_values_2.name: id_values_2.array.take(cols, allow_fill=True),
+                             match_values_1.name: match_values_1.array.take(rows),
+                             match_values_2.name: match_values_2.array.take(cols, allow_fill=True),
+                             score_col: pair_scores})
+
+    def score_pairs(self, selected_output_type, match_values_1, match_values_2, scorer,
+                    total_tasks, update_threshold, candidates=None, workers=-1, threshold_value=None):
+        '''
+        Scores chunks of dataset 1 against dataset 2 with RapidFuzz cdist, keeping the pairs required by the output type.
+        Each distinct string is only scored once, with the scores then mapped back to every row sharing it.
+        If blocking candidates are given, only those pairs are scored.
 
-            # Loop over all entries in dataset 1
-            for i in range(len(dataset_1_df)):
+        Parameters
+        ----------
+        selected_output_type
+            Desired output structure: All combinations, best combinations, above threshold.
+        match_values_1
+            Series of strings to match from dataset 1
+        match_values_2
+            Series of strings to match from dataset 2
+        scorer
+            RapidFuzz scorer object: E.G. QRatio, Set Ratio
+        total_tasks
+            Total taks for display on progres bar
+        update_threshold
+            Threshold to update progress bar
+        candidates, optional
+            Candidate dataset 2 rows for each row of dataset 1 from blocking, by default None
+        workers, optional
+            Number of threads for RapidFuzz to score with, by default -1 using all cores
+        threshold_value, optional
+            Minimum score to keep when matching above threshold, by default None
 
-                # Initialise max score and best match variables to be updated through loop
-                # Note: max_score set to -1 so even if all scores are zero all rows from df 1 still appear
-                max_score, best_match = -1, None
+        Returns
+        -------
+            Arrays of the dataset 1 row, dataset 2 row and score of each matched pair.
+            A dataset 2 row of -1 marks a row without candidates.
+        '''
 
-                # Loop over rows in dataset 2
-                for j in range(len(dataset_2_df)):
+        # Extract the match columns once as lists, RapidFuzz then scores every pair in a single batched call
+        queries = match_values_1.tolist()
+        choices = match_values_2.tolist()
+
+        # For threshold matching, pass the cutoff so RapidFuzz can skip low scoring pairs inside the C++ kernel
+        threshold_value = threshold_value if selected_output_type == 3 else None
+
+        # Scores are whole numbers, so compare the uint8 scores against the threshold rounded up rather than as floats
+        min_score = math.ceil(threshold_value) if selected_output_type == 3 else None
+
+        # Sort ratio is the plain ratio of the strings with their tokens sorted, so sort the tokens of each string
+        # once up front rather than for every pair
+        presort_tokens = scorer is rf.fuzz.token_sort_ratio
+        if presort_tokens:
+            scorer = rf.fuzz.ratio
+
+        # Blocking - score only the candidate pairs
+        if candidates is not None:
+            rows, cols, pair_scores = self.score_candidates(self.sort_tokens(queries) if presort_tokens else queries,
+                                                            self.sort_tokens(choices) if presort_tokens else choices,
+                                                            scorer, threshold_value, candidates,
+                                                            total_tasks, update_threshold, workers)
+
+            # 1 - All possible combinations keeps every candidate pair
+            # 2 - Highest matches only
+            if selected_output_type == 2:
+                rows, cols, pair_scores = self.select_best_candidates(rows, cols, pair_scores, len(queries))
+
+            # 3 - Matches above threshold
+            # Note: candidates come from the secondary match columns when matching on 2 columns, so can still pair
+            # missing values. These score zero, which would pass a threshold of zero, so leave them out explicitly
+            elif selected_output_type == 3:
+                keep = ((pair_scores >= min_score) & ~np.asarray(pd.isna(match_values_1))[rows]
+                        & ~np.asarray(pd.isna(match_values_2))[cols])
+                rows, cols, pair_scores = rows[keep], cols[keep], pair_scores[keep]
 
-                    # Calculate match score of (i,j)
-                    score = scorer(dataset_1_df[match_col_1].iloc[i], dataset_2_df[match_col_2].iloc[j])
-                    
-                    # Replace max_score and best match index
-                    if score > max_score:
-                        max_score = score
-                        best_match = j
-                
-                # Append only the best match to results 
-                data.append([dataset_1_df[id_col_1].iloc[i], dataset_2_df[id_col_2].iloc[best_match], 
-                                dataset_1_df[match_col_1].iloc[i], dataset_2_df[match_col_2].iloc[best_match], max_score])
-                
-                # Update progress
-                self.update_progress(update_threshold, total_tasks)
-        
-        # 3 - Matches above threshold 
-        elif selected_output_type == 3:
-
-            # Get threshold value
-            threshold_value = float(self.score_threshold_spinbox.get())
-
-            # Loop over rows in dataset 1
-            for i in range(len(dataset_1_df)):
-
-                # Extract all scores above the specified threshold
-                results = rf.process.extract(
-                    dataset_1_df[match_col_1].iloc[i],
-                    dataset_2_df[match_col_2].tolist(),
-                    scorer=scorer,
-                    score_cutoff=threshold_value,
-                    limit=None
-                )
-                
-                # Extract results and store in the data list
-                for result in results:
-                    match, score, _ = result
-                    matched_row = dataset_2_df[dataset_2_df[match_col_2] == match].iloc[0]
-                    data.append([dataset_1_df[id_col_1].iloc[i], matched_row[id_col_2], 
-                                 dataset_1_df[match_col_1].iloc[i], matched_row[match_col_2], score])
-                    
-                # Update progress
-                self.update_progress(update_threshold, total_tasks)
+        else:
+            # Label each row with the position of its string among the distinct strings, in order of first appearance
+            # Note: missing values are kept as a distinct string, whose scores are set to zero below
+            codes_1, uniques_1 = pd.factorize(match_values_1, use_na_sentinel=False)
+            codes_2, uniques_2 = pd.factorize(match_values_2, use_na_sentinel=False)
+            missing_1, missing_2 = np.flatnonzero(pd.isna(uniques_1)), np.flatnonzero(pd.isna(uniques_2))
+            uniques_1, uniques_2 = uniques_1.tolist(), uniques_2.tolist()
+            if presort_tokens:
+                uniques_1, uniques_2 = self.sort_tokens(uniques_1), self.sort_tokens(uniques_2)
+
+            # For QRatio, a pair of lengths a and b scores at most 200 * min(a, b) / (a + b), so strings far shorter
+            # or longer cannot reach the threshold. Sort both sides by length so each chunk of dataset 1 only needs
+            # comparing against a window of dataset 2. This bound does not hold for the token based scorers
+            # Note: allow half a point below the threshold for scores that round up
+            length_filter = selected_output_type == 3 and scorer is rf.fuzz.QRatio and threshold_value >= 1
+            if length_filter:
+                min_length_ratio = (threshold_value - 0.5) / (200.5 - threshold_value)
+                codes_1, uniques_1, missing_1, lengths_1 = self.sort_by_length(codes_1, uniques_1, missing_1)
+                codes_2, uniques_2, missing_2, lengths_2 = self.sort_by_length(codes_2, uniques_2, missing_2)
+
+            rows_per_unique_1 = np.bincount(codes_1, minlength=len(uniques_1))
+
+            # Reuse the scores of an earlier run on the same distinct strings with the same scorer, where the matrix is
+            # small enough to keep. Missing values are keyed as None, as NaN never compares equal
+            # Note: threshold matching drops pairs below the unrounded threshold inside cdist, so is not cached
+            score_key = None
+            if selected_output_type != 3 and len(uniques_1) * len(uniques_2) <= SCORE_CACHE_BYTES:
+                score_key = (scorer, tuple(text if isinstance(text, str) else None for text in uniques_1),
+                             tuple(text if isinstance(text, str) else None for text in uniques_2))
+            unique_scores = self.get_cached_scores(score_key)
+
+            # Score the full matrix for all combinations, or to keep it for later runs
+            full_matrix = selected_output_type == 1 or score_key is not None
+
+            if unique_scores is not None:
+                self.debug_message("Reusing scores from an earlier run")
+                self.update_progress(update_threshold, total_tasks, len(codes_1))
+            else:
+                if full_matrix:
+                    unique_scores = np.empty((len(uniques_1), len(uniques_2)), dtype=np.uint8)
+                elif selected_output_type == 2:
+                    best_cols, best_scores = np.zeros(len(uniques_1), dtype=np.intp), np.zeros(len(uniques_1), dtype=np.uint8)
+                elif selected_output_type == 3:
+                    unique_rows, unique_cols, unique_pair_scores = [np.empty(0, dtype=np.intp)], [np.empty(0, dtype=np.intp)], [np.empty(0, dtype=np.uint8)]
+
+                # Loop over chunks of distinct strings in dataset 1 so only one block of the score matrix is held at a time
+                for start in range(0, len(uniques_1), CHUNK_SIZE):
+                    chunk_end = min(start + CHUNK_SIZE, len(uniques_1))
+
+                    # Select the dataset 2 strings with lengths able to reach the threshold
+                    col_start, col_end = 0, len(uniques_2)
+                    if length_filter:
+                        chunk_lengths = lengths_1[start:chunk_end]
+                        col_start = np.searchsorted(lengths_2, chunk_lengths[0] * min_length_ratio, side="left")
+                        col_end = np.searchsorted(lengths_2, chunk_lengths[-1] / min_length_ratio, side="right")
+
+                    # Score the window against one tile of dataset 2 strings at a time
+                    # Note: the full matrix keeps every score regardless, so score the whole window as a single tile
+                    tile_size = TILE_SIZE if not full_matrix else max(col_end - col_start, 1)
+                    for tile_start in range(col_start, col_end, tile_size):
+                        tile_end = min(tile_start + tile_size, col_end)
+
+                        # Compute the block of scores across all cores
+                        # Note: scores are integers from 0 to 100, so store one byte per pair
+                        scores = rf.process.cdist(uniques_1[start:chunk_end], uniques_2[tile_start:tile_end], scorer=scorer,
+                                                  score_cutoff=threshold_value, dtype=np.uint8, workers=workers)
+
+                        # cdist leaves the scores of missing values unset with integer dtypes, so zero them
+                        tile_missing_1 = missing_1[(missing_1 >= start) & (missing_1 < chunk_end)] - start
+                        tile_missing_2 = missing_2[(missing_2 >= tile_start) & (missing_2 < tile_end)] - tile_start
+                        scores[tile_missing_1] = 0
+                        scores[:, tile_missing_2] = 0
+
+                        # 1 - All possible combinations, or a matrix to cache, keep the whole block
+                        if full_matrix:
+                            unique_scores[start:chunk_end, tile_start:tile_end] = scores
+
+                        # 2 - Highest matches only
+                        # Note: best_matches returns the first highest match in the tile, and a later tile only replaces it
+                        # with a strictly higher score. So even if all scores are zero all rows from df 1 still appear
+                        elif selected_output_type == 2:
+                            tile_cols, tile_scores = best_matches(scores)
+                            chunk_cols, chunk_scores = best_cols[start:chunk_end], best_scores[start:chunk_end]
+                            better = tile_scores > chunk_scores
+                            chunk_cols[better], chunk_scores[better] = tile_start + tile_cols[better], tile_scores[better]
+
+                            # Stop early once every string in the chunk has a perfect match
+                            if chunk_scores.min() == 100:
+                                break
+
+                        # 3 - Matches above threshold
+                        # Note: a threshold of zero would keep the zeroed scores of missing values, so leave them out
+                        elif selected_output_type == 3:
+                            keep = scores >= min_score
+                            keep[tile_missing_1] = False
+                            keep[:, tile_missing_2] = False
+                            chunk_rows, chunk_cols = np.nonzero(keep)
+                            unique_rows.append(start + chunk_rows)
+                            unique_cols.append(tile_start + chunk_cols)
+                            unique_pair_scores.append(scores[chunk_rows, chunk_cols])
+
+                    # Update progress by the number of dataset 1 rows covered
+                    self.update_progress(update_threshold, total_tasks, int(rows_per_unique_1[start:chunk_end].sum()))
+
+                if score_key is not None:
+                    self.cache_scores(score_key, unique_scores)
+
+            # Highest matches are taken from the full matrix when it has been scored or reused
+            if selected_output_type == 2 and full_matrix:
+                best_cols, best_scores = best_matches(unique_scores)
+
+            # Map the scores of distinct strings back to the rows of each dataset
+            if selected_output_type == 1:
+                # Note: index both axes at once, rather than taking the rows then the columns, to skip a temporary copy
+                rows = np.repeat(np.arange(len(codes_1)), len(codes_2))
+                cols = np.tile(np.arange(len(codes_2)), len(codes_1))
+                pair_scores = unique_scores[np.ix_(codes_1, codes_2)].ravel()
+
+            elif selected_output_type == 2:
+                # The first row of dataset 2 holding the best string is the first highest match, as strings are in order of appearance
+                _, first_rows_2 = np.unique(codes_2, return_index=True)
+                rows = np.arange(len(codes_1))
+                cols = first_rows_2[best_cols[codes_1]]
+                pair_scores = best_scores[codes_1]
+
+            elif selected_output_type == 3:
+                unique_rows, unique_cols = np.concatenate(unique_rows), np.concatenate(unique_cols)
+                unique_pair_scores = np.concatenate(unique_pair_scores)
+
+                # Expand each pair of strings to every dataset 2 row holding the second string
+                rows_2 = np.argsort(codes_2, kind="stable")
+                rows_per_unique_2 = np.bincount(codes_2, minlength=len(uniques_2))
+                first_positions_2 = np.cumsum(rows_per_unique_2) - rows_per_unique_2
+                pair_index = np.repeat(np.arange(len(unique_rows)), rows_per_unique_2[unique_cols])
+                expanded_cols = rows_2[self.expand_ranges(first_positions_2[unique_cols], rows_per_unique_2[unique_cols])]
+                order = np.lexsort((expanded_cols, unique_rows[pair_index]))
+                pair_index, expanded_cols = pair_index[order], expanded_cols[order]
+
+                # Then give each dataset 1 row the expanded pairs of its string
+                pairs_per_unique_1 = np.bincount(unique_rows[pair_index], minlength=len(uniques_1))
+                first_pairs_1 = np.cumsum(pairs_per_unique_1) - pairs_per_unique_1
+                selected = self.expand_ranges(first_pairs_1[codes_1], pairs_per_unique_1[codes_1])
+                rows = np.repeat(np.arange(len(codes_1)), pairs_per_unique_1[codes_1])
+                cols = expanded_cols[selected]
+                pair_scores = unique_pair_scores[pair_index[selected]]
+
+        # Note: pairs with a missing match variable already score zero, from zeroing the missing rows and columns of each
+        # score block or from cdist scoring candidates against missing values as zero, and threshold matching leaves
+        # them out, so the results need no further pass
+        return rows, cols, pair_scores
+    
+    def get_cached_scores(self, score_key):
+        '''
+        Helper function to fetch the score matrix kept from an earlier run, if any, marking it as most recently used.
+        '''
+        if score_key is None:
+            return None
+        with self.score_cache_lock:
+            scores = self.score_cache.get(score_key)
+            if scores is not None:
+                self.score_cache.move_to_end(score_key)
+            return scores
 
-        # If any rows are missing a match variable set the score to zero
-        for row in data:
-            if pd.isna(row[2]) or pd.isna(row[3]):
-                row[4] = 0
+    def cache_scores(self, score_key, scores):
+        '''
+        Helper function to keep a score matrix for later runs, dropping the least recently used to stay within SCORE_CACHE_BYTES.
+        '''
+        with self.score_cache_lock:
+            self.score_cache[score_key] = scores
+            while sum(cached.nbytes for cached in self.score_cache.values()) > SCORE_CACHE_BYTES:
+                self.score_cache.popitem(last=False)
 
-        # Return a list of lists
-        return data
-    
     def multi_match(self, selected_output_type, dataset_1_df, dataset_2_df, match_columns_1, match_columns_2, 
-                 id_col_1, id_col_2, scorer, total_tasks, update_threshold, combination_method, score_1_weight):
+                 id_col_1, id_col_2, scorer, total_tasks, update_threshold, combination_method, score_1_weight,
+                 candidates=None, threshold_value=None):
         '''
         Performs the matching operation across multiple columns.
         Aggregates the results using the specified method.
@@ -887,58 +1583,83 @@ class MatchingTool:
             Takes values: Maximum, Minimum, Weighted Average
         score_1_weight
             Weight placed on score 1 when the weighted average option is selected
+        candidates, optional
+            Candidate dataset 2 rows for each row of dataset 1 from blocking, by default None
+            The same candidates are scored for every match column so the results line up.
+        threshold_value, optional
+            Minimum score to keep when matching above threshold, by default None
 
         Returns
         -------
-            A list of lists 
+            A DataFrame of the matching results, with the match columns and score for each set followed by the combined score
         '''
-        # Initialise list to store result dataframes in
-        results = []
-        
-        # Loop over entries in match columns
-        for index in range(len(match_columns_1)):
-            match_col_1 = match_columns_1[index]
-            match_col_2 = match_columns_2[index]
-            
-            # Get list of lists for each set of match columns
-            data = self.generate_matches(selected_output_type, dataset_1_df, 
-                                         dataset_2_df, match_col_1, match_col_2, 
-                                         id_col_1, id_col_2, scorer, total_tasks,
-                                         update_threshold)
-            
-            # Convert to a pandas df for easy merge
-            df = pd.DataFrame(data,
-                              columns=[id_col_1, id_col_2, match_col_1, match_col_2, f"score_{index+1}"])
-            # Append the results to the master 
-            results.append(df)
-            self.debug_message(f"Matching on column {index+1} completed")
-        
-        # Intialise the result df with the first set of results
-        final_df = results[0]
+        # Extract the columns once, the scoring threads only see the match columns and return positions
+        id_values_1, id_values_2 = dataset_1_df[id_col_1], dataset_2_df[id_col_2]
+        match_values_1 = [dataset_1_df[match_col_1] for match_col_1 in match_columns_1]
+        match_values_2 = [dataset_2_df[match_col_2] for match_col_2 in match_columns_2]
+
+        # Score each set of match columns at once, RapidFuzz releases the GIL while scoring
+        # Note: split the cores between the columns so the two scoring threads do not oversubscribe them
+        workers = max(1, (os.cpu_count() or 1) // len(match_columns_1))
+        with ThreadPoolExecutor(max_workers=len(match_columns_1)) as executor:
+            futures = [executor.submit(self.score_pairs, selected_output_type, values_1, values_2, scorer,
+                                       total_tasks, update_threshold, candidates, workers, threshold_value)
+                       for values_1, values_2 in zip(match_values_1, match_values_2)]
+
+        # Collect the matched pairs for each set of match columns
+        results = [future.result() for future in futures]
+        self.debug_message(f"Matching on all {len(results)} columns completed")
+
+        # All possible combinations scores the same pairs in the same order for every set of match columns,
+        # so check for this and place the scores side by side rather than merging on the id columns
+        rows, cols, pair_scores = results[0]
+        if all(np.array_equal(rows, other_rows) and np.array_equal(cols, other_cols) for other_rows, other_cols, _ in results[1:]):
+            # Sort the pairs by id, as the outer merge does, ranking each dataset's ids rather than the stacked pairs
+            # Note: missing ids rank last, with a trailing rank for dataset 2 positions of -1, which take as missing
+            rank_1, rank_2 = (pd.factorize(id_values, sort=True)[0] for id_values in (id_values_1, id_values_2))
+            rank_1[rank_1 < 0] = len(rank_1)
+            rank_2 = np.append(np.where(rank_2 < 0, len(rank_2), rank_2), len(rank_2))
+            order = np.lexsort((rank_2[cols], rank_1[rows]))
+            rows, cols = rows[order], cols[order]
+            results = [(rows, cols, np.asarray(pair_scores)[order]) for _, _, pair_scores in results]
+
+            final_df = self.build_matches(id_values_1, id_values_2, match_values_1[0], match_values_2[0],
+                                          rows, cols, results[0][2], "score_1")
+            for index, (_, _, pair_scores) in enumerate(results[1:], start=1):
+                final_df[match_columns_1[index]] = match_values_1[index].array.take(rows)
+                final_df[match_columns_2[index]] = match_values_2[index].array.take(cols, allow_fill=True)
+                final_df[f"score_{index+1}"] = pair_scores
 
-        # For each other set of results, merge on id columns
-        for df in results[1:]: # Currently results is length 2 since only 2 column matching implemented
-            final_df = final_df.merge(df, on=[id_col_1, id_col_2], how="outer")
+        else:
+            # Intialise the result df with the first set of results
+            final_df = self.build_matches(id_values_1, id_values_2, match_values_1[0], match_values_2[0],
+                                          rows, cols, pair_scores, "score_1")
+
+            # For each other set of results, merge on id columns
+            for index, (rows, cols, pair_scores) in enumerate(results[1:], start=1): # Currently only 2 column matching implemented
+                df = self.build_matches(id_values_1, id_values_2, match_values_1[index], match_values_2[index],
+                                        rows, cols, pair_scores, f"score_{index+1}")
+                final_df = final_df.merge(df, on=[id_col_1, id_col_2], how="outer")
         
         # Extract a list of all the score columns from each match set
         score_columns = [col for col in final_df.columns if col.startswith('score_')]
         
-        # Combine the scores from each match into one with the defined method
+        # Combine the scores from each match into one with the defined method, reducing the NumPy array of scores directly
+        # Note: after a merge, pairs only kept for some sets of match columns are missing the other scores.
+        # fmax and fmin skip these, while the weighted average leaves the combined score missing
         if combination_method == 'Maximum':
             # Take the max of all scores, concept equivalent to logical OR
-            final_df['score'] = final_df[score_columns].max(axis=1)
+            final_df['score'] = np.fmax.reduce(final_df[score_columns].to_numpy(), axis=1)
         elif combination_method == 'Minimum':
             # Take the min of all scores, concept equivalent to logical AND
-            final_df['score'] = final_df[score_columns].min(axis=1)
+            final_df['score'] = np.fmin.reduce(final_df[score_columns].to_numpy(), axis=1)
         elif combination_method == 'Weighted Average':
             # Take the weighted average of scores, using the specified weight on score 1
-            final_df['score'] = score_1_weight * final_df['score_1'] + (1- score_1_weight) * final_df['score_2']
+            final_df['score'] = weighted_average(final_df['score_1'].to_numpy(), final_df['score_2'].to_numpy(), score_1_weight)
         
-        # Convert output dataframe back to a list to apply consistent formatting as standard matching
-        output_data = final_df.values.tolist()
-        return output_data
+        return final_df
 
-    def clean_data(self, result_df, id_col_1):
+    def clean_data(self, result_df, id_col_1, manual_checks=False):
         '''
         Sorts result_df by match score highest to lowest within dataset 1 ID.
         Optionally returns comment and match variables if specified.
@@ -949,26 +1670,75 @@ class MatchingTool:
             The dataframe to be cleaned
         id_col_1
             The ID variable from result_df within which to group results
+        manual_checks, optional
+            Whether to add columns to aid manual checks, by default False
 
         Returns
         -------
             _description_
         '''
-        # Group by the dataset 1 ID variable
-        result_df['group_id'] = result_df.groupby([id_col_1], sort=False).ngroup() + 1
+        # Label the dataset 1 IDs in order of first appearance, with rows missing an ID grouped together at the end
+        group_ids, _ = pd.factorize(result_df[id_col_1], sort=False)
+        group_ids[group_ids < 0] = len(group_ids)
 
-        # Sort within group on match score
-        result_df.sort_values(by=['group_id', 'Match Score'], ascending=[True, False], inplace=True)
-        result_df.drop(columns = ['group_id'], inplace = True)
+        # Sort on the labels, then on match score highest to lowest within each
+        # Note: lexsort is stable, so equal scores keep their order. uint8 scores are reversed without widening,
+        # while missing scores are floats and sort last as NaN
+        scores = result_df['Match Score'].to_numpy()
+        order = np.lexsort((255 - scores if scores.dtype == np.uint8 else -scores, group_ids))
+        result_df = result_df.take(order)
 
         # If specified, add columns to aid manual checks
-        if self.clean_switch.get() == 1:
+        if manual_checks:
             result_df['Valid Match'] = 0
             result_df['Comments'] = ''
 
         self.debug_message("Output cleaned")
         return result_df  
     
+    def write_output(self, result_df, output_file):
+        '''
+        Writes the output in the format given by the file extension.
+        CSVs are written with pyarrow where available, which avoids converting each cell to a string in Python.
+
+        Parameters
+        ----------
+        result_df
+            The dataframe to be output
+        output_file
+            Path to output file (xlsx, csv, dta or parquet)
+        '''
+        if output_file.endswith('.xlsx'):
+            result_df.to_excel(output_file, index=False, engine="xlsxwriter")
+
+        elif output_file.endswith('.csv'):
+            # Note: pyarrow is optional, and cannot convert columns of mixed types. Fall back to pandas in either case
+            try:
+                import pyarrow as pa
+                import pyarrow.csv as pa_csv
+                table = pa.Table.from_pandas(result_df, preserve_index=False)
+            except (ImportError, TypeError, ValueError):
+                # Set utf-8-sig to display non unicode characters in excel
+                result_df.to_csv(output_file, index=False, encoding='utf-8-sig')
+                return
+
+            with open(output_file, 'wb') as file:
+                # Write the utf-8-sig byte order mark to display non unicode characters in excel
+                file.write(b'\xef\xbb\xbf')
+                pa_csv.write_csv(table, file)
+
+        elif output_file.endswith('.dta'):
+            result_df.to_stata(output_file, write_index=False)
+
+        elif output_file.endswith('.parquet'):
+            # Note: Parquet dictionary encodes by default, which with zstd compresses the repeated IDs and match strings well.
+            # Columns of mixed types cannot be written to Parquet, so write those as text
+            try:
+                result_df.to_parquet(output_file, index=False, compression='zstd')
+            except (TypeError, ValueError):
+                mixed_cols = result_df.select_dtypes(include='object').columns
+                result_df.astype({col: str for col in mixed_cols}).to_parquet(output_file, index=False, compression='zstd')
+
     def save_data(self, result_df):
         '''
         Write the output to the desired file.
@@ -982,15 +1752,7 @@ class MatchingTool:
         output_file = self.output_path.get()
     
         try:
-            if output_file.endswith('.xlsx'):
-                result_df.to_excel(output_file, index=False, engine="xlsxwriter")
-
-            elif output_file.endswith('.csv'):
-                # Set utf-8-sig to display non unicode characters in excel
-                result_df.to_csv(output_file, index=False, encoding='utf-8-sig')
-
-            elif output_file.endswith('.dta'):
-                result_df.to_stata(output_file, write_index=False)
+            self.write_output(result_df, output_file)
     
             # Add an animal fact if fact_switch is set
             animal_fact = "\n\n" + random.choice(facts) if self.fact_switch_flag.get() == 1 else ""
@@ -1002,6 +1764,14 @@ class MatchingTool:
             self.show_error("Write permission denied. Is the output file open?")
             self.run_matching_button.configure(state="normal")
 
+        except ImportError as error:
+            # Note: only Parquet output needs pyarrow, other writers can fail to import their own engines
+            if output_file.endswith('.parquet'):
+                self.show_error("Parquet output requires pyarrow, please export to a CSV.")
+            else:
+                self.show_error(f"Unable to write output, missing library: {error}")
+            self.run_matching_button.configure(state="normal")
+
     def run_matching(self):
         '''
         Primary function to execute when the run button is clicked.
@@ -1010,33 +1780,49 @@ class MatchingTool:
 
         if not self.validate_inputs():
             return
-        
-        multi_match_flag = self.multi_match_switch.get()
 
-        # Load datasets
-        dataset_1_df, dataset_1_rows, dataset_1_id_col, dataset_1_match_col_1, dataset_1_match_col_2, dataset_1_other_cols = self.load_dataset(
-                    self.dataset_1_path.get(), self.dataset_1_id_col,
-                    self.dataset_1_match_col_1.get(), multi_match_flag,
-                    self.dataset_1_match_col_2.get()
-                )
-        dataset_2_df, dataset_2_rows, dataset_2_id_col, dataset_2_match_col_1, dataset_2_match_col_2, dataset_2_other_cols = self.load_dataset(
-                    self.dataset_2_path.get(), self.dataset_2_id_col,
-                    self.dataset_2_match_col_1.get(), multi_match_flag,
-                    self.dataset_2_match_col_2.get()
-                )
-        
-        # If dataset is too large, export to csv
-        if dataset_1_rows * dataset_2_rows > 100000 and not self.output_path.get().endswith('.csv'):
-            self.show_error("Too much data for this format, please export to a CSV.")
-            self.run_matching_button.configure(state="normal")
-            return
+        # Wait for the data libraries if they are still importing
+        load_libraries()
         
+        multi_match_flag = self.multi_match_var.get()
+        blocking_flag = self.blocking_flag.get()
+        keep_columns_flag = self.keep_columns_flag.get()
+
+        # Retrieve cached row counts, the datasets themselves are prepared in the worker thread
+        (dataset_1_rows, _), _ = self.dataset_cache[self.dataset_1_path.get()]
+        (dataset_2_rows, _), _ = self.dataset_cache[self.dataset_2_path.get()]
+
         # Set up tasks and threshold
         total_tasks, update_threshold, selected_output_type = self.setup_tasks(dataset_1_rows)
+
+        # If the output is too large, export to csv or parquet
+        # Note: the output size is only known up front for all combinations without blocking, and for highest matches only.
+        # Otherwise it depends on the scores, so is checked once matching has finished
+        large_output = self.output_path.get().endswith(('.csv', '.parquet'))
+        expected_rows = None
+        if selected_output_type == 1 and not blocking_flag:
+            expected_rows = dataset_1_rows * dataset_2_rows
+        elif selected_output_type == 2:
+            expected_rows = dataset_1_rows
+        if not large_output and expected_rows is not None and expected_rows > MAX_OUTPUT_ROWS:
+            self.show_error("Too much data for this format, please export to a CSV or Parquet file.")
+            self.run_matching_button.configure(state="normal")
+            return
     
         # Get scorer function
         scorer = self.get_scorer()
 
+        # Read all remaining settings on the main thread
+        dataset_settings = [(self.dataset_1_path.get(), self.dataset_1_id_col.get(),
+                             self.dataset_1_match_col_1.get(), self.dataset_1_match_col_2.get()),
+                            (self.dataset_2_path.get(), self.dataset_2_id_col.get(),
+                             self.dataset_2_match_col_1.get(), self.dataset_2_match_col_2.get())]
+        score_method = self.score_method_var.get()
+        score_1_weight = self.weight_var.get()
+        threshold_value = float(self.score_threshold_spinbox.get()) if selected_output_type == 3 else None
+        ascii_convert_flag = self.ascii_convert_flag.get()
+        clean_flag = self.clean_flag.get()
+
         # Setup for matching
         self.current_progress = 0
         # Use a queue here to avoid interfering with the GUI via a worker thread.
@@ -1048,15 +1834,33 @@ class MatchingTool:
         # Disable run button when matching begins
         self.run_matching_button.configure(state="disabled")
 
-        def run_in_thread():
+        def match_datasets():
             '''
-            Function to execute within the worker thread, performs the actual matching
+            Loads the datasets, performs the actual matching and stores the cleaned result
             '''
+            # Load datasets
+            ((dataset_1_df, _, dataset_1_id_col, dataset_1_match_col_1, dataset_1_match_col_2, dataset_1_other_cols),
+             (dataset_2_df, _, dataset_2_id_col, dataset_2_match_col_1, dataset_2_match_col_2, dataset_2_other_cols)) = [
+                self.load_dataset(path, id_col, match_col_1, multi_match_flag, match_col_2, keep_columns_flag,
+                                  ascii_convert_flag)
+                for path, id_col, match_col_1, match_col_2 in dataset_settings
+            ]
+
+            # Row counts cached on file selection can be estimates, so recount the tasks from the loaded data
+            task_count = len(dataset_1_df)
+
+            # Find candidate pairs, blocking on the secondary match columns first when matching on 2 columns
+            candidates = None
+            if blocking_flag:
+                block_col_1, block_col_2 = ((dataset_1_match_col_2, dataset_2_match_col_2) if multi_match_flag
+                                            else (dataset_1_match_col_1, dataset_2_match_col_1))
+                candidates = self.get_block_candidates(dataset_1_df[block_col_1], dataset_2_df[block_col_2])
+
             if multi_match_flag:
                 data = self.multi_match(
                     selected_output_type, dataset_1_df, dataset_2_df, [dataset_1_match_col_1, dataset_1_match_col_2],
-                      [dataset_2_match_col_1, dataset_2_match_col_2], dataset_1_id_col, dataset_2_id_col, scorer, total_tasks*2,
-                        update_threshold, self.score_method_var.get(), self.weight_var.get())
+                      [dataset_2_match_col_1, dataset_2_match_col_2], dataset_1_id_col, dataset_2_id_col, scorer, task_count*2,
+                        update_threshold, score_method, score_1_weight, candidates, threshold_value=threshold_value)
 
                 column_list = [dataset_1_id_col,
                                dataset_2_id_col,
@@ -1071,7 +1875,8 @@ class MatchingTool:
             else:
                 data = self.generate_matches(
                     selected_output_type, dataset_1_df, dataset_2_df, dataset_1_match_col_1, dataset_2_match_col_1,
-                    dataset_1_id_col, dataset_2_id_col, scorer, total_tasks, update_threshold
+                    dataset_1_id_col, dataset_2_id_col, scorer, task_count, update_threshold, candidates,
+                    threshold_value=threshold_value
                 )
 
                 column_list = [dataset_1_id_col,
@@ -1080,10 +1885,40 @@ class MatchingTool:
                                dataset_2_match_col_1,
                                'Match Score']
 
+            self.debug_message('Matching completed')
+            result_df = data.set_axis(column_list, axis=1)
+
+            if not large_output and len(result_df) > MAX_OUTPUT_ROWS:
+                self.progress_queue.put(("error", "Too much data for this format, please export to a CSV or Parquet file."))
+                return
+
+            # Store scores as uint8, the writers convert them to integers on output
+            # Note: multi match scores can be missing where a pair was only kept for one set of match columns, these stay floats
+            score_columns = [col for col in ['Score 1', 'Score 2', 'Match Score']
+                             if col in column_list and not result_df[col].isna().any()]
+            result_df[score_columns] = result_df[score_columns].astype(np.uint8)
+
+            # Keep additional columns if specified
+            if keep_columns_flag == 1:
+                for df, cols, id_col in [(dataset_1_df, dataset_1_other_cols, dataset_1_id_col),
+                                        (dataset_2_df, dataset_2_other_cols, dataset_2_id_col)]:
+                    result_df = pd.merge(result_df, df[cols], how='left', on=id_col)
+
             # Save result_df, and tell the queue execution has fnished
-            self.result_df = pd.DataFrame(data, columns=column_list)
+            self.result_df = self.clean_data(result_df, dataset_1_id_col, clean_flag)
             self.progress_queue.put(("result", None))
 
+        def run_in_thread():
+            '''
+            Function to execute within the worker thread, reporting any error back to the main thread so the run button
+            is re-enabled
+            '''
+            # Note: files can be moved or edited after they are selected, so errors are not limited to invalid settings
+            try:
+                match_datasets()
+            except Exception as error:
+                self.progress_queue.put(("error", str(error)))
+
         # Initialise the worker thread
         matching_thread = threading.Thread(
             # Use daemon to ensure all threads are killed when the app closes
@@ -1097,41 +1932,44 @@ class MatchingTool:
         def check_progress():
             '''
             Monitors progress by retrieving updates from the queue
+            Only the latest progress is drawn, so the bar is redrawn at most once per check
             '''
-            try:
-                while True:
-                    # Retrieve next update without blocking
+            # Retrieve updates without blocking until the queue is empty or matching has finished
+            latest_progress, update = None, None
+            while True:
+                try:
                     update = self.progress_queue.get_nowait()
-
-                    if update[0] == "result":
-                        # Matching complete
-                        on_result_ready()
-                        return
-                    
-                    else:
-                        # Update progress if ongoing
-                        total, completed = update
-                        self.update_progress_bar(total, completed)
-            # If no updates available, check again in 100ms
-            except queue.Empty:
+                except queue.Empty:
+                    update = None
+                    break
+                if update[0] in ("result", "error"):
+                    break
+                latest_progress = update
+
+            # Update progress if ongoing
+            if latest_progress is not None:
+                total, completed = latest_progress
+                self.update_progress_bar(total, completed)
+
+            if update is None:
+                # If no updates available, check again in 100ms
                 self.root.after(100, check_progress)
 
+            elif update[0] == "result":
+                # Matching complete. Redraw before saving, as writing the output blocks the main thread
+                self.root.update_idletasks()
+                on_result_ready()
+
+            else:
+                # Loading failed, report the error and allow another run
+                self.show_error(update[1])
+                self.run_matching_button.configure(state="normal")
+
         def on_result_ready():
             '''
-            Clean and save the data when queue reports the thread has finished
+            Save the data when queue reports the thread has finished
             '''
-            # Retrieve final df
-            self.debug_message('Matching completed')
-            result_df = self.result_df
-
-            # Keep additional columns if specified
-            if self.keep_columns_switch.get() == 1:
-                for df, cols, id_col in [(dataset_1_df, dataset_1_other_cols, dataset_1_id_col),
-                                        (dataset_2_df, dataset_2_other_cols, dataset_2_id_col)]:
-                    result_df = pd.merge(result_df, df[cols], how='left', on=id_col)
-            result_df = self.clean_data(result_df, dataset_1_id_col)
-            # Save data
-            self.save_data(result_df)
+            self.save_data(self.result_df)
             self.run_matching_button.configure(state="normal")
 
         check_progress()
@@ -1143,7 +1981,6 @@ class MatchingTool:
         '''
         self.progress_bar.set(current_progress / total_tasks)
         self.progress_label.configure(text=f"Progress: {current_progress}/{total_tasks}")
-        self.root.update_idletasks()
 
     def show_error(self, message):
         '''